@@ -0,0 +1,113 @@
+"""
+Throughput benchmark for bulk profile import.
+
+Generates an NDJSON or CSV file of synthetic profiles and either imports it through a running
+server (--url, end to end including MongoDB) or runs it through the parse/validate stage only.
+
+    python bench_profile_import.py --rows 100000 --format ndjson
+    python bench_profile_import.py --rows 100000 --format csv --url http://localhost:8000 --api-key $PARTNER_API_KEY
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import time
+
+import httpx
+
+from profile_io import iter_ndjson_rows, iter_csv_rows, validate_profile_row
+
+INTOLERANCES = ["dairy", "egg", "gluten", "peanut", "seafood", "soy", "wheat"]
+MEAL_TYPES = ["vegetarian", "vegan", "ketogenic", "paleo", None]
+READ_SIZE = 64 * 1024
+
+
+def generate_profiles(rows):
+    for i in range(rows):
+        yield {
+            "user_id": f"bench-user-{i}",
+            "gender": random.randint(0, 1),
+            "age": random.randint(16, 80),
+            "height": round(random.uniform(150, 200), 1),
+            "weight": round(random.uniform(45, 120), 1),
+            "intolerances": random.sample(INTOLERANCES, random.randint(0, 2)),
+            "meal_type": random.choice(MEAL_TYPES),
+        }
+
+
+def write_file(path, rows, format):
+    with open(path, "w", newline="") as f:
+        if format == "csv":
+            writer = csv.writer(f)
+            writer.writerow(["user_id", "gender", "age", "height", "weight", "intolerances", "meal_type"])
+            for p in generate_profiles(rows):
+                writer.writerow([p["user_id"], p["gender"], p["age"], p["height"], p["weight"],
+                                 ";".join(p["intolerances"]), p["meal_type"] or ""])
+        else:
+            for p in generate_profiles(rows):
+                f.write(json.dumps(p) + "\n")
+
+
+async def read_chunks(path):
+    with open(path, "rb") as f:
+        while chunk := f.read(READ_SIZE):
+            yield chunk
+
+
+async def bench_parse(path, format):
+    rows = iter_csv_rows(read_chunks(path)) if format == "csv" else iter_ndjson_rows(read_chunks(path))
+    processed, errors = 0, 0
+    async for _, record in rows:
+        processed += 1
+        if validate_profile_row(record)[1]:
+            errors += 1
+    return {"processed": processed, "errors": errors}
+
+
+async def bench_import(path, format, url, api_key):
+    async with httpx.AsyncClient(timeout=None) as client:
+        response = await client.post(
+            f"{url.rstrip('/')}/user/profiles/import",
+            params={"format": format},
+            headers={"X-API-Key": api_key or ""},
+            content=read_chunks(path),
+        )
+        response.raise_for_status()
+        result = response.json()
+    return {**result, "errors": len(result["errors"])}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    parser.add_argument("--file", help="Existing file to import instead of generating one")
+    parser.add_argument("--url", help="Base URL of a running server; omit to benchmark parsing only")
+    parser.add_argument("--api-key", default=os.getenv("PARTNER_API_KEY"))
+    args = parser.parse_args()
+
+    path = args.file or f"bench_profiles_{args.rows}.{args.format}"
+    if not args.file:
+        write_file(path, args.rows, args.format)
+
+    start = time.perf_counter()
+    if args.url:
+        result = asyncio.run(bench_import(path, args.format, args.url, args.api_key))
+    else:
+        result = asyncio.run(bench_parse(path, args.format))
+    elapsed = time.perf_counter() - start
+
+    stage = "end to end" if args.url else "parse + validate"
+    print(f"{stage}: {result['processed']} rows in {elapsed:.2f}s "
+          f"({result['processed'] / elapsed:,.0f} rows/s), {result['errors']} errors")
+    if args.url:
+        print(f"inserted: {result['inserted']}, updated: {result['updated']}")
+
+    if not args.file:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,6 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne, InsertOne, DeleteMany, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
 from dotenv import load_dotenv
 import os
 import datetime
@@ -6,6 +8,10 @@ from bson import ObjectId
 
 load_dotenv()
 
+PROFILE_BULK_CHUNK_SIZE = 1000
+DUPLICATE_POST_WINDOW = datetime.timedelta(days=1)
+TITLE_CLAIM_ATTEMPTS = 3
+
 class DatabaseManager:
     def __init__(self):
         self.client = AsyncIOMotorClient(os.getenv('MONGODB_URI'))
@@ -18,7 +24,48 @@ class DatabaseManager:
 
         self.forum_posts = self.db.forum_posts
         self.forum_comments = self.db.forum_comments
+        self.forum_post_titles = self.db.forum_post_titles
+
+    async def ensure_indexes(self):
+        # One profile per user; lets profile writes rely on the index instead of a pre-check.
+        # Duplicate user_id profiles left over from before the index existed must be removed first.
+        try:
+            await self.user_profiles.create_index("user_id", unique=True)
+        except OperationFailure as e:
+            print(f"Could not create unique user_id index on user_profiles: {e}")
+
+        # Title claims expire after the duplicate window, so the unique index only covers recent posts
+        await self.forum_post_titles.create_index([("user_id", 1), ("title", 1)], unique=True)
+        await self.forum_post_titles.create_index("post_id")
+        await self.forum_post_titles.create_index(
+            "created_at", expireAfterSeconds=int(DUPLICATE_POST_WINDOW.total_seconds())
+        )
+        await self.backfill_post_title_claims()
+
+    async def backfill_post_title_claims(self):
+        # Posts made within the duplicate window before claims existed still need to block re-posts
+        since = datetime.datetime.utcnow() - DUPLICATE_POST_WINDOW
+        cursor = self.forum_posts.find(
+            {"created_at": {"$gte": since}},
+            {"user_id": 1, "title": 1, "created_at": 1}
+        )
+        operations = [
+            UpdateOne(
+                {"user_id": post["user_id"], "title": post["title"]},
+                {"$setOnInsert": {"post_id": str(post["_id"]), "created_at": post["created_at"]}},
+                upsert=True
+            )
+            async for post in cursor
+        ]
 
+        for start in range(0, len(operations), PROFILE_BULK_CHUNK_SIZE):
+            try:
+                await self.forum_post_titles.bulk_write(
+                    operations[start:start + PROFILE_BULK_CHUNK_SIZE], ordered=False
+                )
+            except BulkWriteError:
+                # A concurrent claim for the same title already covers it
+                pass
 
     async def log_calorie_prediction(self, prediction_data):
         return await self.calorie_predictions.insert_one(prediction_data)
@@ -47,7 +94,64 @@ class DatabaseManager:
         # Set created_at and updated_at timestamps
         profile_data["created_at"] = datetime.datetime.utcnow()
         profile_data["updated_at"] = datetime.datetime.utcnow()
-        return await self.user_profiles.insert_one(profile_data)
+
+        # Insert only if no profile exists for this user, in a single round trip
+        try:
+            result = await self.user_profiles.update_one(
+                {"user_id": profile_data["user_id"]},
+                {"$setOnInsert": profile_data},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            return None
+
+        return result.upserted_id
+
+    async def bulk_upsert_user_profiles(self, profiles):
+        # profiles is one batch of (row, profile_data); callers keep batches to PROFILE_BULK_CHUNK_SIZE.
+        # The write is unordered so one bad row doesn't stop the rest.
+        now = datetime.datetime.utcnow()
+        summary = {"inserted": 0, "updated": 0, "errors": []}
+
+        operations = []
+        for row, profile_data in profiles:
+            profile_id = profile_data.pop("_id", None)
+            profile_data.pop("created_at", None)
+            profile_data["updated_at"] = now
+
+            on_insert = {"created_at": now}
+            if profile_id:
+                on_insert["_id"] = profile_id
+
+            operations.append(UpdateOne(
+                {"user_id": profile_data["user_id"]},
+                {"$set": profile_data, "$setOnInsert": on_insert},
+                upsert=True
+            ))
+
+        if not operations:
+            return summary
+
+        try:
+            result = await self.user_profiles.bulk_write(operations, ordered=False)
+            details = result.bulk_api_result
+        except BulkWriteError as bwe:
+            details = bwe.details
+            for error in details.get("writeErrors", []):
+                summary["errors"].append({
+                    "row": profiles[error["index"]][0],
+                    "error": error.get("errmsg", "Write failed")
+                })
+
+        summary["inserted"] = details.get("nUpserted", 0)
+        summary["updated"] = details.get("nMatched", 0)
+        return summary
+
+    async def stream_user_profiles(self, batch_size=PROFILE_BULK_CHUNK_SIZE):
+        cursor = self.user_profiles.find({}).sort("user_id", 1).batch_size(batch_size)
+        async for profile in cursor:
+            profile["_id"] = str(profile["_id"])
+            yield profile
 
     async def get_user_profile(self, user_id):
         profile = await self.user_profiles.find_one({"user_id": user_id})
@@ -69,20 +173,30 @@ class DatabaseManager:
         post_data["created_at"] = datetime.datetime.utcnow()
         post_data["updated_at"] = datetime.datetime.utcnow()
         post_data["comment_count"] = 0
+        post_data["_id"] = ObjectId()
+        post_id = str(post_data["_id"])
         
-        # Check for duplicate title (within last 24 hours by same user)
-        one_day_ago = datetime.datetime.utcnow() - datetime.timedelta(days=1)
-        duplicate = await self.forum_posts.find_one({
+        # Claim the title for this user; the unique index rejects duplicates within the last 24 hours
+        title_claim = {
             "user_id": post_data["user_id"],
             "title": post_data["title"],
-            "created_at": {"$gte": one_day_ago}
-        })
-        
-        if duplicate:
+            "post_id": post_id,
+            "created_at": post_data["created_at"]
+        }
+        try:
+            await self.forum_post_titles.insert_one(title_claim)
+        except DuplicateKeyError:
             return None
-            
-        result = await self.forum_posts.insert_one(post_data)
-        return result.inserted_id
+
+        try:
+            await self.forum_posts.insert_one(post_data)
+        except:
+            await self.forum_post_titles.delete_one({"post_id": post_id})
+            raise
+
+        # The stored post is already in hand, so it is returned without re-reading it
+        post_data["_id"] = post_id
+        return post_data
 
     async def get_forum_posts(self, skip=0, limit=10, tag=None):
         query = {}
@@ -107,27 +221,73 @@ class DatabaseManager:
         except:
             return None
 
+    async def _claim_post_title(self, post_id, user_id, title, claimed_at):
+        # Claims title for the post and releases its previous claim in one ordered batch;
+        # a duplicate stops the batch before the release runs.
+        # Returns True if claimed, None if the post already holds the title, False if another post does.
+        operations = [
+            InsertOne({"user_id": user_id, "title": title, "post_id": post_id, "created_at": claimed_at}),
+            DeleteMany({"post_id": post_id, "user_id": user_id, "title": {"$ne": title}})
+        ]
+        for _ in range(TITLE_CLAIM_ATTEMPTS):
+            try:
+                await self.forum_post_titles.bulk_write(operations, ordered=True)
+                return True
+            except BulkWriteError as bwe:
+                if any(error.get("code") != 11000 for error in bwe.details.get("writeErrors", [])):
+                    raise
+
+            existing = await self.forum_post_titles.find_one({"user_id": user_id, "title": title})
+            if existing:
+                return None if existing["post_id"] == post_id else False
+            # The conflicting claim expired or was released in between, so try again
+
+        return False
+
     async def update_forum_post(self, post_id, user_id, update_data):
+        # Returns the updated post, None if it isn't found or owned by user_id,
+        # or False if the new title duplicates one of the user's recent posts
         update_data["updated_at"] = datetime.datetime.utcnow()
         
+        if not ObjectId.is_valid(post_id):
+            return None
+
+        # Claim a changed title before writing it so duplicates are rejected atomically.
+        # The claim is dated from the edit, so the new title is protected for a full window.
+        new_title = update_data.get("title")
+        claimed = None
+        if new_title is not None:
+            claimed = await self._claim_post_title(post_id, user_id, new_title, update_data["updated_at"])
+            if claimed is False:
+                return False
+
         try:
-            result = await self.forum_posts.update_one(
+            post = await self.forum_posts.find_one_and_update(
                 {"_id": ObjectId(post_id), "user_id": user_id},
-                {"$set": update_data}
+                {"$set": update_data},
+                return_document=ReturnDocument.AFTER
             )
-            return result.modified_count > 0
         except:
-            return False
+            post = None
+
+        if not post:
+            if claimed:
+                await self.forum_post_titles.delete_one({"post_id": post_id, "title": new_title})
+            return None
+
+        post["_id"] = str(post["_id"])
+        return post
 
     async def delete_forum_post(self, post_id, user_id):
         try:
-            result = await self.forum_posts.delete_one(
+            post = await self.forum_posts.find_one_and_delete(
                 {"_id": ObjectId(post_id), "user_id": user_id}
             )
             
-            if result.deleted_count > 0:
-                # Also delete associated comments
+            if post:
+                # Also delete associated comments and release the title claim
                 await self.forum_comments.delete_many({"post_id": post_id})
+                await self.forum_post_titles.delete_many({"post_id": post_id})
                 return True
             return False
         except:
@@ -137,15 +297,30 @@ class DatabaseManager:
         comment_data["created_at"] = datetime.datetime.utcnow()
         comment_data["updated_at"] = datetime.datetime.utcnow()
         
-        result = await self.forum_comments.insert_one(comment_data)
-        
-        # Increment comment count on post
-        await self.forum_posts.update_one(
+        if not ObjectId.is_valid(comment_data["post_id"]):
+            return None
+
+        # Increment comment count on post; this doubles as the existence check
+        post = await self.forum_posts.find_one_and_update(
             {"_id": ObjectId(comment_data["post_id"])},
-            {"$inc": {"comment_count": 1}}
+            {"$inc": {"comment_count": 1}},
+            projection={"_id": 1}
         )
         
-        return str(result.inserted_id)
+        if not post:
+            return None
+
+        try:
+            result = await self.forum_comments.insert_one(comment_data)
+        except:
+            await self.forum_posts.update_one(
+                {"_id": ObjectId(comment_data["post_id"])},
+                {"$inc": {"comment_count": -1}}
+            )
+            raise
+        
+        comment_data["_id"] = str(result.inserted_id)
+        return comment_data
 
     async def get_forum_comments(self, post_id, skip=0, limit=20):
         query = {"post_id": post_id}
@@ -161,26 +336,19 @@ class DatabaseManager:
 
     async def delete_forum_comment(self, comment_id, user_id):
         try:
-            # Find the comment first to get the post_id
-            comment = await self.forum_comments.find_one({"_id": ObjectId(comment_id), "user_id": user_id})
+            # Delete the comment and get back its post_id in one step
+            comment = await self.forum_comments.find_one_and_delete(
+                {"_id": ObjectId(comment_id), "user_id": user_id}
+            )
             
             if not comment:
                 return False
                 
-            post_id = comment["post_id"]
-            
-            # Delete the comment
-            result = await self.forum_comments.delete_one(
-                {"_id": ObjectId(comment_id), "user_id": user_id}
+            # Decrement comment count on post
+            await self.forum_posts.update_one(
+                {"_id": ObjectId(comment["post_id"])},
+                {"$inc": {"comment_count": -1}}
             )
-            
-            if result.deleted_count > 0:
-                # Decrement comment count on post
-                await self.forum_posts.update_one(
-                    {"_id": ObjectId(post_id)},
-                    {"$inc": {"comment_count": -1}}
-                )
-                return True
-            return False
+            return True
         except:
             return False
\ No newline at end of file
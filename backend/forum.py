@@ -1,29 +1,30 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Depends
 from typing import Optional
 import math
 from bson import ObjectId
 
 from models import ForumPost, ForumPostUpdate, ForumComment, ForumCommentCreate, PaginatedResponse
 from database import DatabaseManager
+from rate_limit import RateLimit
 
 router = APIRouter(prefix="/forum", tags=["forum"])
 db_manager = DatabaseManager()
 
 # Posts endpoints
-@router.post("/posts", response_model=ForumPost)
+@router.post("/posts", response_model=ForumPost,
+             dependencies=[Depends(RateLimit("forum-posts", per_user="5/60", global_limit="100/60"))])
 async def create_post(post: ForumPost):
     # User ID is now expected to be provided in the post object
     post_data = post.model_dump(exclude={"id", "created_at", "updated_at", "comment_count"})
     
-    post_id = await db_manager.create_forum_post(post_data)
+    created_post = await db_manager.create_forum_post(post_data)
     
-    if not post_id:
+    if not created_post:
         raise HTTPException(
             status_code=400, 
             detail="A similar post was already created recently. Please wait 24 hours before posting again."
         )
     
-    created_post = await db_manager.get_forum_post(post_id)
     return created_post
 
 @router.get("/posts", response_model=PaginatedResponse)
@@ -66,12 +67,17 @@ async def update_post(
     if not update_data:
         raise HTTPException(status_code=400, detail="No valid fields to update")
     
-    success = await db_manager.update_forum_post(post_id, user_id, update_data)
+    updated_post = await db_manager.update_forum_post(post_id, user_id, update_data)
     
-    if not success:
+    if updated_post is False:
+        raise HTTPException(
+            status_code=400,
+            detail="A similar post was already created recently. Please choose a different title."
+        )
+
+    if not updated_post:
         raise HTTPException(status_code=404, detail="Post not found or you don't have permission to edit it")
     
-    updated_post = await db_manager.get_forum_post(post_id)
     return updated_post
 
 @router.delete("/posts/{post_id}")
@@ -87,33 +93,25 @@ async def delete_post(
     return {"message": "Post deleted successfully"}
 
 
-@router.post("/posts/{post_id}/comments", response_model=ForumComment)
+@router.post("/posts/{post_id}/comments", response_model=ForumComment,
+             dependencies=[Depends(RateLimit("forum-comments", per_user="20/60"))])
 async def create_comment(
     post_id: str,
     comment: ForumCommentCreate,
     user_id: str = Query(...)  # This makes it a required query parameter
 ):
-    # Check if post exists
-    post = await db_manager.get_forum_post(post_id)
-    
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
-    
     comment_data = {
         "post_id": post_id,
         "user_id": user_id,
         "content": comment.content
     }
     
-    comment_id = await db_manager.create_forum_comment(comment_data)
+    created_comment = await db_manager.create_forum_comment(comment_data)
     
-    # Fetch the created comment
-    comments, _ = await db_manager.get_forum_comments(post_id)
-    for c in comments:
-        if c["_id"] == comment_id:
-            return c
+    if not created_comment:
+        raise HTTPException(status_code=404, detail="Post not found")
     
-    raise HTTPException(status_code=500, detail="Error retrieving created comment")
+    return created_comment
 
 @router.get("/posts/{post_id}/comments", response_model=PaginatedResponse)
 async def list_comments(
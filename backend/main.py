@@ -1,20 +1,33 @@
 import os
+import secrets
 import httpx
 import asyncio
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request, Depends, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 
 from models import CaloriePredictionInput, CaloriePredictionResult, MealPlanRequest, MealPlanResult, UserProfile
 from ml_predictor import CaloriePredictor
-from database import DatabaseManager
+from database import DatabaseManager, PROFILE_BULK_CHUNK_SIZE
 from forum import router as forum_router
+from rate_limit import RateLimit, configure_store as configure_rate_limit_store
+from profile_io import (iter_ndjson_rows, iter_csv_rows, validate_profile_row,
+                        profile_to_ndjson, profile_csv_header, profile_to_csv)
 
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await db_manager.ensure_indexes()
+    await rate_limit_store.ensure_indexes()
+    yield
+
 app = FastAPI(  title="nexaFit",
                 description="A complete nutrition and lifestyle support platform.",
-                version="1.2.0",)
+                version="1.2.0",
+                lifespan=lifespan,)
 
 # CORS Configuration
 app.add_middleware(
@@ -23,12 +36,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],
 )
 app.include_router(forum_router)
 
 # Initialize ML Predictor and Database
 ml_predictor = CaloriePredictor(os.getenv('CALORIE_MODEL_PATH'))
 db_manager = DatabaseManager()
+rate_limit_store = configure_rate_limit_store(db_manager.db)
+
+# -------------------------------------------------------------------
+async def require_partner_key(x_api_key: str = Header(None)):
+    # Bulk profile routes are for admins and partner gyms only; disabled unless PARTNER_API_KEY is set
+    expected_key = os.getenv("PARTNER_API_KEY")
+    if not expected_key or not x_api_key or not secrets.compare_digest(x_api_key, expected_key):
+        raise HTTPException(status_code=403, detail="A valid partner API key is required")
 
 # -------------------------------------------------------------------
 async def generate_meal_plan(diet: str = None, calories: int = None, intolerances: list = None):
@@ -116,7 +138,7 @@ async def predict_calories(input_data: CaloriePredictionInput):
         raise HTTPException(status_code=500, detail=str(e))
     
 # -------------------------------------------------------------------
-@app.post("/meal-plan")
+@app.post("/meal-plan", dependencies=[Depends(RateLimit("meal-plan", per_user="3/600", global_limit="30/60"))])
 async def create_meal_plan(request: MealPlanRequest, user_id: str):
     try:
         # Get user profile to supplement request data
@@ -175,14 +197,12 @@ async def create_meal_plan(request: MealPlanRequest, user_id: str):
 @app.post("/user/profile")
 async def create_user_profile(profile: UserProfile):
     try:
-        # Check if profile already exists
-        existing_profile = await db_manager.get_user_profile(profile.user_id)
-        if existing_profile:
-            raise HTTPException(status_code=400, detail="Profile already exists for this user")
-        
-        # Create new profile
+        # Create new profile; rejected atomically if one already exists
         profile_data = profile.model_dump(by_alias=True)
-        await db_manager.create_user_profile(profile_data)
+        created_id = await db_manager.create_user_profile(profile_data)
+        if created_id is None:
+            raise HTTPException(status_code=400, detail="Profile already exists for this user")
+
         return {"message": "Profile created successfully"}
     
     except HTTPException as he:
@@ -190,6 +210,63 @@ async def create_user_profile(profile: UserProfile):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# -------------------------------------------------------------------
+@app.post("/user/profiles/import", dependencies=[Depends(require_partner_key)])
+async def import_user_profiles(request: Request, format: str = Query("ndjson", pattern="^(ndjson|csv)$")):
+    try:
+        rows = iter_csv_rows(request.stream()) if format == "csv" else iter_ndjson_rows(request.stream())
+
+        processed = 0
+        summary = {"inserted": 0, "updated": 0, "errors": []}
+        chunk = []
+
+        async def flush(batch):
+            result = await db_manager.bulk_upsert_user_profiles(batch)
+            summary["inserted"] += result["inserted"]
+            summary["updated"] += result["updated"]
+            summary["errors"].extend(result["errors"])
+
+        # Validate and write in chunks so large files never sit in memory at once
+        async for row, record in rows:
+            processed += 1
+            profile_data, error = validate_profile_row(record)
+            if error:
+                summary["errors"].append({"row": row, "error": error})
+                continue
+
+            chunk.append((row, profile_data))
+            if len(chunk) >= PROFILE_BULK_CHUNK_SIZE:
+                await flush(chunk)
+                chunk = []
+
+        if chunk:
+            await flush(chunk)
+
+        summary["errors"].sort(key=lambda e: e["row"])
+        return {"processed": processed, **summary}
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# -------------------------------------------------------------------
+@app.get("/user/profiles/export", dependencies=[Depends(require_partner_key)])
+async def export_user_profiles(format: str = Query("ndjson", pattern="^(ndjson|csv)$")):
+    async def ndjson_lines():
+        async for profile in db_manager.stream_user_profiles():
+            yield profile_to_ndjson(profile)
+
+    async def csv_lines():
+        yield profile_csv_header()
+        async for profile in db_manager.stream_user_profiles():
+            yield profile_to_csv(profile)
+
+    if format == "csv":
+        return StreamingResponse(csv_lines(), media_type="text/csv",
+                                 headers={"Content-Disposition": "attachment; filename=profiles.csv"})
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson",
+                             headers={"Content-Disposition": "attachment; filename=profiles.ndjson"})
+
 # -------------------------------------------------------------------
 @app.get("/user/profile/{user_id}")
 async def get_user_profile(user_id: str):
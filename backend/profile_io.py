@@ -0,0 +1,182 @@
+import codecs
+import csv
+import io
+import json
+import datetime
+
+from pydantic import ValidationError
+
+from models import UserProfile
+
+PROFILE_CSV_FIELDS = [
+    "user_id", "gender", "age", "height", "weight",
+    "intolerances", "meal_type", "created_at", "updated_at"
+]
+INTOLERANCE_SEPARATOR = ";"
+MAX_CSV_RECORD_CHARS = 64 * 1024
+
+
+async def iter_lines(byte_stream):
+    # Re-chunk a raw request body into text lines without buffering the whole upload
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in byte_stream:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+async def iter_ndjson_rows(byte_stream):
+    row = 0
+    async for line in iter_lines(byte_stream):
+        row += 1
+        if not line.strip():
+            continue
+        try:
+            yield row, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield row, ValueError(f"Invalid JSON: {e.msg}")
+
+
+def _ends_in_quoted_field(line, in_quotes):
+    # Follows csv's default dialect: a quote only opens a field at its start, and "" inside quotes is literal
+    if not in_quotes and '"' not in line:
+        return False
+
+    field_start = not in_quotes
+    i = 0
+    while i < len(line):
+        char = line[i]
+        if in_quotes:
+            if char == '"':
+                if line[i + 1:i + 2] == '"':
+                    i += 1
+                else:
+                    in_quotes = False
+        elif char == '"' and field_start:
+            in_quotes = True
+        field_start = not in_quotes and char == ","
+        i += 1
+    return in_quotes
+
+
+async def iter_csv_records(byte_stream):
+    # Quoted fields may contain newlines, so lines are joined while a quoted field is open.
+    # Yields record text, or a ValueError when a quoted field runs past MAX_CSV_RECORD_CHARS.
+    lines = []
+    length = 0
+    in_quotes = False
+    async for line in iter_lines(byte_stream):
+        lines.append(line)
+        length += len(line) + 1
+        in_quotes = _ends_in_quoted_field(line, in_quotes)
+
+        if not in_quotes:
+            yield "\n".join(lines)
+        elif length > MAX_CSV_RECORD_CHARS:
+            yield ValueError(
+                f"Unterminated quoted field; skipped {len(lines)} lines after it ran past "
+                f"{MAX_CSV_RECORD_CHARS} characters"
+            )
+        else:
+            continue
+
+        lines = []
+        length = 0
+        in_quotes = False
+
+    if lines:
+        yield "\n".join(lines)
+
+
+async def iter_csv_rows(byte_stream):
+    header = None
+    row = 0
+    async for record_text in iter_csv_records(byte_stream):
+        if isinstance(record_text, ValueError):
+            row += 1
+            yield row, record_text
+            continue
+        if not record_text.strip():
+            continue
+
+        try:
+            values = next(csv.reader([record_text]))
+        except csv.Error as e:
+            values = e
+
+        if header is None:
+            if isinstance(values, csv.Error):
+                yield 0, ValueError(f"Invalid CSV header: {values}")
+                return
+            header = values
+            continue
+
+        row += 1
+        if isinstance(values, csv.Error):
+            yield row, ValueError(f"Invalid CSV: {values}")
+            continue
+        if len(values) != len(header):
+            yield row, ValueError(f"Expected {len(header)} columns, got {len(values)}")
+            continue
+
+        record = {k: v for k, v in zip(header, values) if v != ""}
+        if "intolerances" in record:
+            record["intolerances"] = [
+                i.strip() for i in record["intolerances"].split(INTOLERANCE_SEPARATOR) if i.strip()
+            ]
+        yield row, record
+
+
+def validate_profile_row(record):
+    # Returns (profile_data, None) on success or (None, error message) on failure.
+    # Only fields present in the row are returned, so an upsert leaves missing fields untouched.
+    if isinstance(record, Exception):
+        return None, str(record)
+    if not isinstance(record, dict):
+        return None, "Row must be an object"
+    try:
+        profile = UserProfile.model_validate(record)
+    except ValidationError as e:
+        return None, "; ".join(
+            f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in e.errors()
+        )
+    return profile.model_dump(by_alias=True, exclude_unset=True), None
+
+
+def _json_default(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def profile_to_ndjson(profile):
+    return json.dumps(profile, default=_json_default) + "\n"
+
+
+def profile_csv_header():
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(PROFILE_CSV_FIELDS)
+    return buffer.getvalue()
+
+
+def profile_to_csv(profile):
+    values = []
+    for field in PROFILE_CSV_FIELDS:
+        value = profile.get(field)
+        if value is None:
+            values.append("")
+        elif field == "intolerances":
+            values.append(INTOLERANCE_SEPARATOR.join(value))
+        elif isinstance(value, datetime.datetime):
+            values.append(value.isoformat())
+        else:
+            values.append(value)
+
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
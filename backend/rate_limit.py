@@ -0,0 +1,189 @@
+import os
+import math
+import time
+import asyncio
+import datetime
+from collections import OrderedDict
+from fastapi import HTTPException, Request
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def parse_rate(value):
+    # "<requests>/<seconds>", e.g. "10/60" allows bursts of 10 refilled over a minute
+    if not value:
+        return None
+    requests, seconds = value.split("/")
+    return int(requests), int(requests) / float(seconds)
+
+
+class InMemoryTokenBucketStore:
+    """Token buckets held in process memory; limits apply per worker."""
+
+    # Refilled buckets are dropped a few at a time from the least recently used end
+    EXPIRE_PER_CALL = 8
+
+    def __init__(self, max_keys=100_000):
+        # key -> (tokens, updated, full_after), least recently used first
+        self.buckets = OrderedDict()
+        self.max_keys = max_keys
+        self.lock = asyncio.Lock()
+
+    async def ensure_indexes(self):
+        pass
+
+    async def consume(self, key, capacity, refill_rate):
+        now = time.monotonic()
+        async with self.lock:
+            tokens, updated, _ = self.buckets.get(key, (capacity, now, 0))
+            tokens = min(capacity, tokens + (now - updated) * refill_rate)
+
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self.buckets[key] = (tokens, now, capacity / refill_rate)
+            self.buckets.move_to_end(key)
+
+            self._expire(now)
+
+        return allowed, 0 if allowed else (1 - tokens) / refill_rate
+
+    async def refund(self, key, capacity):
+        async with self.lock:
+            if key in self.buckets:
+                tokens, updated, full_after = self.buckets[key]
+                self.buckets[key] = (min(capacity, tokens + 1), updated, full_after)
+
+    def _expire(self, now):
+        # Each bucket is judged by its own route's refill time; the scan is bounded per call
+        for _ in range(self.EXPIRE_PER_CALL):
+            key, (_, updated, full_after) = next(iter(self.buckets.items()))
+            if now - updated < full_after:
+                break
+            del self.buckets[key]
+
+        # Past the size cap, evict least recently used buckets even if they are still draining
+        while len(self.buckets) > self.max_keys:
+            self.buckets.popitem(last=False)
+
+
+class MongoTokenBucketStore:
+    """Token buckets shared between workers through a MongoDB collection."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def ensure_indexes(self):
+        # Idle buckets are removed once they would have refilled anyway
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def consume(self, key, capacity, refill_rate):
+        now = time.time()
+        expires_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=capacity / refill_rate)
+
+        # Refill and consume in one atomic pipeline update
+        pipeline = [
+            {"$set": {
+                "tokens": {"$min": [capacity, {"$add": [
+                    {"$ifNull": ["$tokens", capacity]},
+                    {"$multiply": [{"$subtract": [now, {"$ifNull": ["$updated", now]}]}, refill_rate]}
+                ]}]},
+                "updated": now,
+                "expires_at": expires_at
+            }},
+            {"$set": {"allowed": {"$gte": ["$tokens", 1]}}},
+            {"$set": {"tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", 1]}, "$tokens"]}}}
+        ]
+
+        try:
+            bucket = await self.collection.find_one_and_update(
+                {"_id": key}, pipeline, upsert=True, return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Another worker created the bucket concurrently; it exists now
+            bucket = await self.collection.find_one_and_update(
+                {"_id": key}, pipeline, return_document=ReturnDocument.AFTER
+            )
+
+        if bucket["allowed"]:
+            return True, 0
+        return False, (1 - bucket["tokens"]) / refill_rate
+
+    async def refund(self, key, capacity):
+        await self.collection.update_one(
+            {"_id": key},
+            [{"$set": {"tokens": {"$min": [capacity, {"$add": ["$tokens", 1]}]}}}]
+        )
+
+
+rate_limit_store = InMemoryTokenBucketStore()
+
+
+def configure_store(db):
+    # Called once at startup with the app's database so the shared backend reuses its client
+    global rate_limit_store
+    if os.getenv("RATE_LIMIT_BACKEND", "memory") == "mongo":
+        rate_limit_store = MongoTokenBucketStore(db.rate_limits)
+    return rate_limit_store
+
+
+class RateLimit:
+    """
+    Route dependency enforcing a per-user and an optional global token bucket.
+
+    Limits default to the given values and can be overridden with
+    RATE_LIMIT_<NAME>_USER / RATE_LIMIT_<NAME>_GLOBAL set to "<requests>/<seconds>".
+    """
+
+    def __init__(self, name, per_user=None, global_limit=None, store=None):
+        env_name = name.upper().replace("-", "_")
+        self.name = name
+        self.per_user = parse_rate(os.getenv(f"RATE_LIMIT_{env_name}_USER", per_user))
+        self.global_limit = parse_rate(os.getenv(f"RATE_LIMIT_{env_name}_GLOBAL", global_limit))
+        self.store = store
+
+    async def __call__(self, request: Request):
+        store = self.store or rate_limit_store
+
+        user_key = None
+        if self.per_user:
+            user_id = await self._get_user_id(request)
+            user_key = f"{self.name}:user:{user_id}"
+            await self._consume(store, user_key, *self.per_user)
+
+        if self.global_limit:
+            try:
+                await self._consume(store, f"{self.name}:global", *self.global_limit)
+            except HTTPException:
+                # The request never ran, so it shouldn't count against the user.
+                # Checking the global bucket first instead would let one user's rejected requests drain it.
+                if user_key:
+                    await store.refund(user_key, self.per_user[0])
+                raise
+
+    async def _consume(self, store, key, capacity, refill_rate):
+        allowed, retry_after = await store.consume(key, capacity, refill_rate)
+        if not allowed:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests. Please try again later.",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+            )
+
+    async def _get_user_id(self, request: Request):
+        # Routes take user_id either as a query parameter or in the JSON body
+        user_id = request.query_params.get("user_id")
+        if not user_id and request.headers.get("content-type", "").startswith("application/json"):
+            try:
+                body = await request.json()
+                if isinstance(body, dict):
+                    user_id = body.get("user_id")
+            except ValueError:
+                pass
+
+        if not user_id:
+            user_id = request.client.host if request.client else "anonymous"
+        return user_id
@@ -0,0 +1,4 @@
+import os
+
+# Modules create their DatabaseManager at import time; Motor connects lazily, so a name is all it needs
+os.environ.setdefault("DATABASE_NAME", "nexafit_test")
@@ -0,0 +1,198 @@
+import asyncio
+import copy
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import InsertOne, DeleteMany
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+import forum
+from database import DatabaseManager
+from models import ForumPostUpdate
+
+
+def _matches(doc, query):
+    for field, expected in query.items():
+        if isinstance(expected, dict) and "$ne" in expected:
+            if doc.get(field) == expected["$ne"]:
+                return False
+        elif doc.get(field) != expected:
+            return False
+    return True
+
+
+class _FakeCollection:
+    # Just enough of a Motor collection for the forum write paths
+    def __init__(self, unique=None):
+        self.docs = []
+        self.unique = unique
+
+    async def insert_one(self, doc):
+        if self.unique and any(all(d.get(f) == doc.get(f) for f in self.unique) for d in self.docs):
+            raise DuplicateKeyError("E11000 duplicate key")
+        doc.setdefault("_id", ObjectId())
+        self.docs.append(copy.deepcopy(doc))
+
+    async def bulk_write(self, operations, ordered):
+        for index, operation in enumerate(operations):
+            if isinstance(operation, InsertOne):
+                try:
+                    await self.insert_one(operation._doc)
+                except DuplicateKeyError:
+                    raise BulkWriteError({"writeErrors": [{"index": index, "code": 11000}]})
+            elif isinstance(operation, DeleteMany):
+                await self.delete_many(operation._filter)
+
+    async def find_one(self, query):
+        return next((copy.deepcopy(d) for d in self.docs if _matches(d, query)), None)
+
+    async def find_one_and_update(self, query, update, return_document=None, projection=None):
+        for doc in self.docs:
+            if _matches(doc, query):
+                doc.update(update.get("$set", {}))
+                for field, amount in update.get("$inc", {}).items():
+                    doc[field] = doc.get(field, 0) + amount
+                return copy.deepcopy(doc)
+        return None
+
+    async def update_one(self, query, update):
+        await self.find_one_and_update(query, update)
+
+    async def find_one_and_delete(self, query):
+        doc = await self.find_one(query)
+        if doc:
+            self.docs = [d for d in self.docs if d["_id"] != doc["_id"]]
+        return doc
+
+    async def delete_one(self, query):
+        await self.find_one_and_delete(query)
+
+    async def delete_many(self, query):
+        self.docs = [d for d in self.docs if not _matches(d, query)]
+
+
+class _FailingInserts(_FakeCollection):
+    async def insert_one(self, doc):
+        raise RuntimeError("insert failed")
+
+
+def _db_manager():
+    db_manager = DatabaseManager.__new__(DatabaseManager)
+    db_manager.forum_posts = _FakeCollection()
+    db_manager.forum_comments = _FakeCollection()
+    db_manager.forum_post_titles = _FakeCollection(unique=("user_id", "title"))
+    return db_manager
+
+
+def _create(db_manager, title, user_id="u1"):
+    return asyncio.run(db_manager.create_forum_post(
+        {"user_id": user_id, "title": title, "content": "Post content", "tags": []}
+    ))
+
+
+def _claims(db_manager):
+    return sorted((c["title"], c["post_id"]) for c in db_manager.forum_post_titles.docs)
+
+
+def test_update_returns_post_and_moves_title_claim():
+    db_manager = _db_manager()
+    post = _create(db_manager, "Leg day")
+
+    updated = asyncio.run(db_manager.update_forum_post(post["_id"], "u1", {"title": "Arm day"}))
+
+    assert updated["_id"] == post["_id"]
+    assert updated["title"] == "Arm day"
+    assert _claims(db_manager) == [("Arm day", post["_id"])]
+
+
+def test_update_returns_none_for_other_users_without_leaving_a_claim():
+    db_manager = _db_manager()
+    post = _create(db_manager, "Leg day")
+
+    assert asyncio.run(db_manager.update_forum_post(post["_id"], "u2", {"title": "Arm day"})) is None
+    assert asyncio.run(db_manager.update_forum_post("not-an-id", "u1", {"title": "Arm day"})) is None
+    assert _claims(db_manager) == [("Leg day", post["_id"])]
+
+
+def test_update_returns_false_for_a_recent_duplicate_title():
+    db_manager = _db_manager()
+    first = _create(db_manager, "Leg day")
+    second = _create(db_manager, "Arm day")
+
+    assert asyncio.run(db_manager.update_forum_post(second["_id"], "u1", {"title": "Leg day"})) is False
+    assert db_manager.forum_posts.docs[1]["title"] == "Arm day"
+    assert _claims(db_manager) == sorted([("Leg day", first["_id"]), ("Arm day", second["_id"])])
+
+
+def test_update_keeping_the_same_title_succeeds():
+    db_manager = _db_manager()
+    post = _create(db_manager, "Leg day")
+
+    updated = asyncio.run(db_manager.update_forum_post(
+        post["_id"], "u1", {"title": "Leg day", "content": "Edited content"}
+    ))
+
+    assert updated["content"] == "Edited content"
+    assert _claims(db_manager) == [("Leg day", post["_id"])]
+
+
+def test_update_retries_when_the_conflicting_claim_disappears():
+    db_manager = _db_manager()
+    post = _create(db_manager, "Leg day")
+    db_manager.forum_post_titles.docs.append({"_id": ObjectId(), "user_id": "u1", "title": "Arm day",
+                                              "post_id": "expired"})
+    titles = db_manager.forum_post_titles
+    find_one = titles.find_one
+
+    async def find_after_expiry(query):
+        # The TTL monitor removes the conflicting claim between the failed insert and the lookup
+        await titles.delete_many({"post_id": "expired"})
+        return await find_one(query)
+
+    titles.find_one = find_after_expiry
+
+    updated = asyncio.run(db_manager.update_forum_post(post["_id"], "u1", {"title": "Arm day"}))
+
+    assert updated["title"] == "Arm day"
+    assert _claims(db_manager) == [("Arm day", post["_id"])]
+
+
+def test_title_claim_lifecycle():
+    db_manager = _db_manager()
+    first = _create(db_manager, "Leg day")
+    assert _create(db_manager, "Leg day") is None
+
+    asyncio.run(db_manager.update_forum_post(first["_id"], "u1", {"title": "Arm day"}))
+    assert _create(db_manager, "Arm day") is None
+    second = _create(db_manager, "Leg day")
+    assert second is not None
+
+    assert asyncio.run(db_manager.delete_forum_post(first["_id"], "u1")) is True
+    assert _claims(db_manager) == [("Leg day", second["_id"])]
+    assert _create(db_manager, "Arm day") is not None
+
+
+def test_create_comment_restores_count_when_insert_fails():
+    db_manager = _db_manager()
+    db_manager.forum_comments = _FailingInserts()
+    post = _create(db_manager, "Leg day")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(db_manager.create_forum_comment({"post_id": post["_id"], "user_id": "u2", "content": "Nice"}))
+
+    assert db_manager.forum_posts.docs[0]["comment_count"] == 0
+
+
+@pytest.mark.parametrize("result, status_code", [(False, 400), (None, 404)])
+def test_update_route_maps_failures_to_status_codes(monkeypatch, result, status_code):
+    class _Manager:
+        async def update_forum_post(self, post_id, user_id, update_data):
+            return result
+
+    monkeypatch.setattr(forum, "db_manager", _Manager())
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(forum.update_post("post", ForumPostUpdate(title="Arm day"), "u1"))
+
+    assert exc_info.value.status_code == status_code
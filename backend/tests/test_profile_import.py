@@ -0,0 +1,124 @@
+import asyncio
+
+from pymongo.errors import BulkWriteError
+
+from database import DatabaseManager
+from profile_io import iter_ndjson_rows, iter_csv_rows, validate_profile_row, MAX_CSV_RECORD_CHARS
+
+
+async def _stream(data, size=7):
+    # Small chunks exercise records and multi-byte characters split across reads
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+async def _collect(rows):
+    return [row async for row in rows]
+
+
+def test_ndjson_rows_report_invalid_json_by_line():
+    data = b'{"user_id": "u1", "gender": 0, "age": 30, "height": 180, "weight": 80}\n\nnot json\n'
+    rows = asyncio.run(_collect(iter_ndjson_rows(_stream(data))))
+
+    assert rows[0] == (1, {"user_id": "u1", "gender": 0, "age": 30, "height": 180, "weight": 80})
+    assert rows[1][0] == 3
+    assert isinstance(rows[1][1], ValueError)
+
+
+def test_csv_rows_handle_bom_quoted_newlines_and_intolerances():
+    data = (
+        "﻿user_id,gender,age,height,weight,intolerances,meal_type\r\n"
+        'u1,0,30,180,80,dairy;gluten,"paleo\r\nweekdays, ""strict"""\r\n'
+        "u2,1,25,165,60,,\r\n"
+        "u3,1,25\r\n"
+    ).encode()
+    rows = asyncio.run(_collect(iter_csv_rows(_stream(data))))
+
+    assert rows[0] == (1, {"user_id": "u1", "gender": "0", "age": "30", "height": "180", "weight": "80",
+                           "intolerances": ["dairy", "gluten"], "meal_type": 'paleo\nweekdays, "strict"'})
+    assert rows[1] == (2, {"user_id": "u2", "gender": "1", "age": "25", "height": "165", "weight": "60"})
+    assert rows[2][0] == 3
+    assert isinstance(rows[2][1], ValueError)
+
+
+def test_csv_rows_treat_quote_inside_unquoted_field_as_text():
+    data = (
+        "user_id,gender,age,height,weight,meal_type\n"
+        'u1,0,30,180,80,5" paleo\n'
+        "u2,1,25,165,60,vegan\n"
+    ).encode()
+    rows = asyncio.run(_collect(iter_csv_rows(_stream(data))))
+
+    assert [row for row, _ in rows] == [1, 2]
+    assert rows[0][1]["meal_type"] == '5" paleo'
+    assert rows[1][1]["user_id"] == "u2"
+
+
+def test_csv_rows_report_unterminated_quote_and_continue():
+    filler = "".join(f"f{i},0,30,180,80,x\n" for i in range(MAX_CSV_RECORD_CHARS // 16))
+    data = (
+        "user_id,gender,age,height,weight,meal_type\n"
+        'u1,0,30,180,80,"never closed\n' + filler +
+        "u2,1,25,165,60,vegan\n"
+    ).encode()
+    rows = asyncio.run(_collect(iter_csv_rows(_stream(data, size=4096))))
+
+    assert rows[0][0] == 1
+    assert "Unterminated quoted field" in str(rows[0][1])
+    assert rows[-1][1]["user_id"] == "u2"
+
+
+def test_csv_rows_report_reader_errors_per_row():
+    data = ("user_id,meal_type\nu1," + "x" * 140_000 + "\nu2,vegan\n").encode()
+    rows = asyncio.run(_collect(iter_csv_rows(_stream(data, size=4096))))
+
+    assert rows[0][0] == 1
+    assert isinstance(rows[0][1], ValueError)
+    assert "Invalid CSV" in str(rows[0][1])
+    assert rows[1] == (2, {"user_id": "u2", "meal_type": "vegan"})
+
+
+def test_validate_profile_row_keeps_only_provided_fields():
+    profile_data, error = validate_profile_row(
+        {"user_id": "u1", "gender": "1", "age": "25", "height": "165", "weight": "60"}
+    )
+
+    assert error is None
+    assert "intolerances" not in profile_data
+    assert "meal_type" not in profile_data
+    assert profile_data["gender"] == 1
+
+
+def test_validate_profile_row_reports_field_errors():
+    profile_data, error = validate_profile_row({"user_id": "u1", "gender": "x", "age": 25, "height": 165})
+
+    assert profile_data is None
+    assert "gender" in error
+    assert "weight" in error
+
+
+class _FailingProfiles:
+    async def bulk_write(self, operations, ordered):
+        assert ordered is False
+        self.operations = operations
+        raise BulkWriteError({
+            "nUpserted": 1,
+            "nMatched": 0,
+            "writeErrors": [{"index": 1, "code": 11000, "errmsg": "E11000 duplicate key"}],
+        })
+
+
+def test_bulk_upsert_reports_write_errors_by_source_row():
+    db_manager = DatabaseManager.__new__(DatabaseManager)
+    db_manager.user_profiles = _FailingProfiles()
+
+    summary = asyncio.run(db_manager.bulk_upsert_user_profiles([
+        (4, {"user_id": "u1", "gender": 0, "age": 30, "height": 180, "weight": 80}),
+        (9, {"user_id": "u1", "gender": 0, "age": 31, "height": 180, "weight": 80}),
+    ]))
+
+    assert summary == {"inserted": 1, "updated": 0,
+                       "errors": [{"row": 9, "error": "E11000 duplicate key"}]}
+    update = db_manager.user_profiles.operations[0]._doc
+    assert "intolerances" not in update["$set"]
+    assert "created_at" in update["$setOnInsert"]
@@ -0,0 +1,101 @@
+import asyncio
+
+from fastapi import FastAPI, Depends
+from fastapi.testclient import TestClient
+
+import rate_limit
+from rate_limit import InMemoryTokenBucketStore, RateLimit
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _store(monkeypatch, **kwargs):
+    clock = _Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    return InMemoryTokenBucketStore(**kwargs), clock
+
+
+def test_consume_allows_capacity_then_reports_retry_time(monkeypatch):
+    store, _ = _store(monkeypatch)
+
+    results = [asyncio.run(store.consume("k", 3, 3 / 600)) for _ in range(4)]
+
+    assert results[:3] == [(True, 0)] * 3
+    allowed, retry_after = results[3]
+    assert allowed is False
+    assert retry_after == 200
+
+
+def test_consume_refills_over_time(monkeypatch):
+    store, clock = _store(monkeypatch)
+    for _ in range(2):
+        asyncio.run(store.consume("k", 2, 1))
+
+    assert asyncio.run(store.consume("k", 2, 1))[0] is False
+    clock.now += 1
+    assert asyncio.run(store.consume("k", 2, 1)) == (True, 0)
+    assert asyncio.run(store.consume("k", 2, 1))[0] is False
+
+
+def test_expire_uses_each_buckets_own_refill_time(monkeypatch):
+    store, clock = _store(monkeypatch)
+    asyncio.run(store.consume("comment", 20, 20 / 60))
+    for _ in range(3):
+        asyncio.run(store.consume("meal-plan", 3, 3 / 600))
+
+    clock.now += 61
+    asyncio.run(store.consume("other", 20, 20 / 60))
+
+    assert "comment" not in store.buckets
+    assert "meal-plan" in store.buckets
+    assert asyncio.run(store.consume("meal-plan", 3, 3 / 600))[0] is False
+
+
+def test_max_keys_evicts_least_recently_used(monkeypatch):
+    store, _ = _store(monkeypatch, max_keys=3)
+    for key in ["a", "b", "c"]:
+        asyncio.run(store.consume(key, 5, 1))
+    asyncio.run(store.consume("a", 5, 1))
+    asyncio.run(store.consume("d", 5, 1))
+
+    assert list(store.buckets) == ["c", "a", "d"]
+
+
+def _client(store, per_user="2/100", global_limit=None):
+    app = FastAPI()
+
+    @app.post("/limited", dependencies=[Depends(RateLimit("test", per_user=per_user,
+                                                          global_limit=global_limit, store=store))])
+    async def limited():
+        return {"ok": True}
+
+    return TestClient(app)
+
+
+def test_global_rejection_refunds_user_token_and_sets_retry_after(monkeypatch):
+    store, _ = _store(monkeypatch)
+    client = _client(store, per_user="2/100", global_limit="1/100")
+
+    assert client.post("/limited", params={"user_id": "u1"}).status_code == 200
+    response = client.post("/limited", params={"user_id": "u1"})
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "100"
+    assert store.buckets["test:user:u1"][0] == 1
+
+
+def test_user_id_is_read_from_query_body_or_client_host(monkeypatch):
+    store, _ = _store(monkeypatch)
+    client = _client(store, per_user="5/100")
+
+    client.post("/limited", params={"user_id": "from-query"})
+    client.post("/limited", json={"user_id": "from-body"})
+    client.post("/limited")
+
+    assert set(store.buckets) == {"test:user:from-query", "test:user:from-body", "test:user:testclient"}